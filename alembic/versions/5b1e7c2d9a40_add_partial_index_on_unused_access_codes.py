@@ -0,0 +1,34 @@
+"""add partial index on unused access codes
+
+Revision ID: 5b1e7c2d9a40
+Revises: c38b7aac933d
+Create Date: 2026-10-15 10:12:41.503318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e7c2d9a40'
+down_revision: Union[str, Sequence[str], None] = 'c38b7aac933d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_unused_access_codes_code',
+        'access_codes',
+        ['code'],
+        unique=False,
+        postgresql_where=sa.text('is_used = false'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_unused_access_codes_code', table_name='access_codes')
@@ -1,9 +1,13 @@
+import hashlib
+import time
 from typing import Annotated
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import make_transient_to_detached
 
 from core.database import get_db
 from core.config import settings
@@ -12,6 +16,31 @@ from models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
+# Verified tokens -> (email, expiry timestamp). Entries live at most JWT_CACHE_TTL
+# seconds and never past the token's own "exp" claim.
+_tok_cache: TTLCache = TTLCache(maxsize=10_000, ttl=settings.JWT_CACHE_TTL)
+
+# Email -> column values of the User loaded by a previous request; dropped via
+# invalidate_user on writes. Live instances are never cached: they stay bound to
+# the session that loaded them and may be mutated by the handler.
+# invalidate_user only clears this process's cache, so other workers can serve
+# the old values for up to USER_CACHE_TTL seconds.
+_user_cache: TTLCache = TTLCache(maxsize=5_000, ttl=settings.USER_CACHE_TTL)
+
+
+def _token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()[:16]
+
+
+def _snapshot(user: User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def invalidate_user(email: str) -> None:
+    """Drop the cached user whose stored state just changed."""
+    _user_cache.pop(email, None)
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[AsyncSession, Depends(get_db)]
@@ -21,18 +50,45 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+
+    email = None
+    if settings.JWT_CACHE_ENABLED:
+        key = _token_key(token)
+        cached = _tok_cache.get(key)
+        if cached is not None:
+            cached_email, expires_at = cached
+            if expires_at > time.time():
+                email = cached_email
+            else:
+                _tok_cache.pop(key, None)
+
+    if email is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+            token_data = TokenData(email=email)
+        except jwt.PyJWTError:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-        
-    result = await db.execute(select(User).where(User.email == token_data.email))
+        email = token_data.email
+        if settings.JWT_CACHE_ENABLED:
+            _tok_cache[key] = (email, payload.get("exp", time.time() + settings.JWT_CACHE_TTL))
+
+    if settings.USER_CACHE_ENABLED:
+        snapshot = _user_cache.get(email)
+        if snapshot is not None:
+            # Rebuild a clean detached User and attach it to this request's session without hitting the DB
+            cached_user = User(**snapshot)
+            make_transient_to_detached(cached_user)
+            return await db.merge(cached_user, load=False)
+
+    result = await db.execute(select(User).where(User.email == email))
     user = result.scalars().first()
-    
+
     if user is None:
         raise credentials_exception
+
+    if settings.USER_CACHE_ENABLED:
+        _user_cache[email] = _snapshot(user)
     return user
@@ -1,13 +1,18 @@
+import asyncio
+import logging
+import secrets
+import httpx
+import orjson
 from typing import Annotated
 from datetime import timedelta
-import httpx
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Header
+from urllib.parse import urlencode
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request, Header
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from jose import jwt
-import uuid
+from sqlalchemy import exists, select, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import jwt
 
 from core.database import get_db
 from core import security
@@ -19,39 +24,52 @@ from schemas.auth import Token, UserCreate, UserLogin, AccessCodeVerify, AccessC
 from api import deps
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # OAuth Configuration
 GOOGLE_AUTH_URI = "https://accounts.google.com/o/oauth2/v2/auth"
 GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
 REDIRECT_URI = f"{settings.BACKEND_URL}/api/v1/auth/callback"
+GOOGLE_LOGIN_URL = f"{GOOGLE_AUTH_URI}?" + urlencode({
+    "client_id": settings.GOOGLE_CLIENT_ID,
+    "redirect_uri": REDIRECT_URI,
+    "response_type": "code",
+    "scope": "openid email profile",
+})
+
+ACCESS_CODE_MAX_ATTEMPTS = 3
 
 @router.post("/signup", response_model=Token)
 async def signup(
+    request: Request,
     user_in: UserCreate,
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    # Check if user exists
-    result = await db.execute(select(User).where(User.email == user_in.email))
-    user = result.scalars().first()
-    if user:
+    # Check if email or username is taken (single round-trip, booleans only)
+    result = await db.execute(
+        select(
+            exists().where(User.email == user_in.email),
+            exists().where(User.username == user_in.username),
+        )
+    )
+    email_taken, username_taken = result.one()
+    if email_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
         )
-        
-    # Check username
-    result = await db.execute(select(User).where(User.username == user_in.username))
-    if result.scalars().first():
+    if username_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken",
         )
 
-    # Create new user
+    # Create new user (bcrypt runs off the event loop)
+    hashed_password = await asyncio.to_thread(security.get_password_hash, user_in.password)
     db_user = User(
         email=user_in.email,
         username=user_in.username,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=hashed_password,
         auth_provider="email"
     )
     db.add(db_user)
@@ -63,7 +81,8 @@ async def signup(
         to_email=db_user.email,
         subject="Welcome to huzlr.",
         template_name="welcome",
-        context={"username": db_user.username}
+        context={"username": db_user.username},
+        client=request.app.state.http,
     )
 
     # Generate token
@@ -84,7 +103,10 @@ async def login(
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalars().first()
     
-    if not user or not user.hashed_password or not security.verify_password(form_data.password, user.hashed_password):
+    password_ok = bool(user and user.hashed_password) and await asyncio.to_thread(
+        security.verify_password, form_data.password, user.hashed_password
+    )
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -101,13 +123,7 @@ async def login(
 
 @router.get("/google-login")
 def google_login():
-    return RedirectResponse(
-        url=f"{GOOGLE_AUTH_URI}"
-            f"?client_id={settings.GOOGLE_CLIENT_ID}"
-            f"&redirect_uri={REDIRECT_URI}"
-            f"&response_type=code"
-            f"&scope=openid%20email%20profile"
-    )
+    return RedirectResponse(url=GOOGLE_LOGIN_URL)
 
 @router.get("/callback")
 async def callback(request: Request, db: Annotated[AsyncSession, Depends(get_db)]):
@@ -115,77 +131,107 @@ async def callback(request: Request, db: Annotated[AsyncSession, Depends(get_db)
     if not code:
         return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/signup?error=missing_code")
 
-    async with httpx.AsyncClient() as client:
-        token_res = await client.post(
-            GOOGLE_TOKEN_URI,
-            data={
-                "code": code,
-                "client_id": settings.GOOGLE_CLIENT_ID,
-                "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                "redirect_uri": REDIRECT_URI,
-                "grant_type": "authorization_code",
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        token_data = token_res.json()
+    client = request.app.state.http
+    token_res = await client.post(
+        GOOGLE_TOKEN_URI,
+        data={
+            "code": code,
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET,
+            "redirect_uri": REDIRECT_URI,
+            "grant_type": "authorization_code",
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    token_data = orjson.loads(token_res.content)
 
-        if "id_token" not in token_data:
-            return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/signup?error=oauth_failed")
+    if "id_token" not in token_data:
+        return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/signup?error=oauth_failed")
 
-        id_token = token_data["id_token"]
-        # In a real scenario, you should verify the signature of id_token
-        # Here we decode unverified claims assuming direct communication with Google's token endpoint is secure enough for this step
-        # or use library to verify. The reference code used get_unverified_claims.
-        userinfo = jwt.get_unverified_claims(id_token)
-        print(userinfo, "<-- user information parsed")
-        email = userinfo.get("email")
-        if not email:
-             return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/signup?error=no_email")
+    id_token = token_data["id_token"]
+    # Verify the signature against Google's cached JWKS; refetch once if the key rotated
+    try:
+        try:
+            userinfo = security.verify_google_id_token(id_token, request.app.state.google_jwks)
+        except KeyError:
+            request.app.state.google_jwks = await security.fetch_google_jwks(client)
+            userinfo = security.verify_google_id_token(id_token, request.app.state.google_jwks)
+    except (KeyError, jwt.PyJWTError, httpx.HTTPError) as e:
+        logger.warning(f"Google id_token verification failed: {e}")
+        return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/signup?error=oauth_failed")
+    logger.debug("Google user information parsed: %s", userinfo)
+    email = userinfo.get("email")
+    if not email:
+         return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/signup?error=no_email")
+    # An unverified Google address must not log into (or take over) an account with that email
+    if userinfo.get("email_verified") is not True:
+         return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/signup?error=email_not_verified")
 
-        # Find or Create User
-        result = await db.execute(select(User).where(User.email == email))
-        user = result.scalars().first()
-        
-        if not user:
-            # Infer username
-            base_username = email.split("@")[0]
-            # Check username existence
-            result = await db.execute(select(User).where(User.username == base_username))
-            if result.scalars().first():
-                 import uuid
-                 base_username = f"{base_username}_{uuid.uuid4().hex[:4]}"
-                 
-            user = User(
-                email=email,
-                username=base_username,
-                hashed_password=None,
-                auth_provider="google",
-                is_active=True
+    # Find or Create User; the inferred username is probed in the same query
+    base_username = email.split("@")[0]
+    result = await db.execute(
+        select(User).where(or_(User.email == email, User.username == base_username))
+    )
+    matches = result.scalars().all()
+    user = next((u for u in matches if u.email == email), None)
+    
+    if not user:
+        # Username taken by another account
+        username = base_username
+        if matches:
+             username = f"{base_username}_{secrets.token_hex(2)}"
+
+        # Insert and read back in one round-trip; a concurrent callback may win the race
+        created = False
+        for _ in range(2):
+            result = await db.execute(
+                pg_insert(User)
+                .values(
+                    email=email,
+                    username=username,
+                    hashed_password=None,
+                    auth_provider="google",
+                    is_active=True
+                )
+                .on_conflict_do_nothing()
+                .returning(User)
             )
-            db.add(user)
-            await db.commit()
-            await db.refresh(user)
+            user = result.scalars().first()
+            if user:
+                created = True
+                break
+            result = await db.execute(select(User).where(User.email == email))
+            user = result.scalars().first()
+            if user:
+                break
+            username = f"{base_username}_{secrets.token_hex(2)}"
 
+        if not user:
+            return RedirectResponse(url=f"{settings.FRONTEND_BASE_URL}/signup?error=oauth_failed")
+        await db.commit()
+
+        if created:
             # Send Welcome Email
             await send_email(
                 to_email=user.email,
                 subject="Welcome to Huzlr",
                 template_name="welcome",
-                context={"username": user.username}
+                context={"username": user.username},
+                client=client,
             )
-            
-        # Create our JWT
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = security.create_access_token(
-            subject=user.email, 
-            expires_delta=access_token_expires,
-            claims={"has_access": user.has_access, "is_waitlisted": user.is_waitlisted}
-        )
         
-        # Redirect to Frontend with token
-        return RedirectResponse(
-            url=f"{settings.FRONTEND_BASE_URL}/auth/success/{access_token}"
-        )
+    # Create our JWT
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = security.create_access_token(
+        subject=user.email, 
+        expires_delta=access_token_expires,
+        claims={"has_access": user.has_access, "is_waitlisted": user.is_waitlisted}
+    )
+    
+    # Redirect to Frontend with token
+    return RedirectResponse(
+        url=f"{settings.FRONTEND_BASE_URL}/auth/success/{access_token}"
+    )
 
 @router.get("/me")
 async def read_users_me(
@@ -221,14 +267,18 @@ async def verify_access_code(
     if current_user.has_access:
         return {"message": "Already has access"}
 
-    result = await db.execute(select(AccessCode).where(AccessCode.code == payload.code))
+    # Only redeemable codes are looked up; "is_used = false" matches the partial index predicate
+    result = await db.execute(
+        select(AccessCode).where(AccessCode.code == payload.code, AccessCode.is_used == False)
+    )
     access_code = result.scalars().first()
 
     if not access_code:
+        # Rare path: tell a spent code apart from an unknown one
+        result = await db.execute(select(exists().where(AccessCode.code == payload.code)))
+        if result.scalar():
+            raise HTTPException(status_code=400, detail="Access code already used")
         raise HTTPException(status_code=400, detail="Invalid access code")
-    
-    if access_code.is_used:
-        raise HTTPException(status_code=400, detail="Access code already used")
 
     # Mark as used
     access_code.is_used = True
@@ -238,47 +288,47 @@ async def verify_access_code(
     current_user.has_access = True
     
     await db.commit()
+    deps.invalidate_user(current_user.email)
     return {"message": "Access granted"}
 
 @router.post("/access-codes", response_model=AccessCodeResponse)
 async def create_access_code(
+    request: Request,
     payload: AccessCodeCreate,
+    background_tasks: BackgroundTasks,
     db: Annotated[AsyncSession, Depends(get_db)],
     x_admin_secret: Annotated[str | None, Header()] = None
 ):
     if not x_admin_secret or x_admin_secret != settings.ADMIN_SECRET:
         raise HTTPException(status_code=403, detail="Invalid admin secret")
 
-    # Generate code if not provided
+    # Insert directly and let the unique index on code detect collisions
     code = payload.code
-    if not code:
-        code = str(uuid.uuid4()).split("-")[0].upper()
-        # Ensure unique
-        while True:
-            result = await db.execute(select(AccessCode).where(AccessCode.code == code))
-            if not result.scalars().first():
-                break
-            code = str(uuid.uuid4()).split("-")[0].upper()
+    for _ in range(ACCESS_CODE_MAX_ATTEMPTS):
+        candidate = code or secrets.token_hex(4).upper()
+        result = await db.execute(
+            pg_insert(AccessCode)
+            .values(code=candidate)
+            .on_conflict_do_nothing(index_elements=[AccessCode.code])
+            .returning(AccessCode.id)
+        )
+        if result.scalar_one_or_none() is not None:
+            code = candidate
+            break
+        if code:
+            raise HTTPException(status_code=400, detail="Code already exists")
     else:
-        # Check if provided code exists
-        result = await db.execute(select(AccessCode).where(AccessCode.code == code))
-        if result.scalars().first():
-             raise HTTPException(status_code=400, detail="Code already exists")
-
-    # Create Code
-    db_code = AccessCode(code=code)
-    db.add(db_code)
+        raise HTTPException(status_code=500, detail="Could not generate a unique access code")
     await db.commit()
-    await db.refresh(db_code)
     
-    # Send Email
-    email_sent = await send_email(
-        to_email=payload.email, 
-        subject="Your Huzlr Access Code", 
-        template_name="access_code", 
-        context={"code": code}
+    # Send email after the response is flushed
+    background_tasks.add_task(
+        send_email,
+        to_email=payload.email,
+        subject="Your Huzlr Access Code",
+        template_name="access_code",
+        context={"code": code},
+        client=request.app.state.http,
     )
     
-    msg = "Access code created and sent via email" if email_sent else "Access code created but email failed to send"
-    
-    return {"code": code, "message": msg}
+    return {"code": code, "message": "Access code created and email queued"}
@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from typing import Any
-import httpx
 import os
+import orjson
 from datetime import datetime, timedelta
 
 from api import deps
@@ -54,6 +54,7 @@ def authorize_jira(
 
 @router.get("/callback")
 async def jira_callback(
+    request: Request,
     code: str,
     state: str,
     db: Session = Depends(deps.get_db)
@@ -76,22 +77,21 @@ async def jira_callback(
         raise HTTPException(status_code=404, detail="User not found")
 
     # Exchange code for tokens
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            JIRA_TOKEN_URL,
-            json={
-                "grant_type": "authorization_code",
-                "client_id": JIRA_CLIENT_ID,
-                "client_secret": JIRA_CLIENT_SECRET,
-                "code": code,
-                "redirect_uri": JIRA_REDIRECT_URI,
-            },
-        )
-        
+    response = await request.app.state.http.post(
+        JIRA_TOKEN_URL,
+        json={
+            "grant_type": "authorization_code",
+            "client_id": JIRA_CLIENT_ID,
+            "client_secret": JIRA_CLIENT_SECRET,
+            "code": code,
+            "redirect_uri": JIRA_REDIRECT_URI,
+        },
+    )
+
     if response.status_code != 200:
         raise HTTPException(status_code=400, detail=f"Failed to retrieve tokens: {response.text}")
 
-    data = response.json()
+    data = orjson.loads(response.content)
     access_token = data.get("access_token")
     refresh_token = data.get("refresh_token")
     expires_in = data.get("expires_in") # in seconds
@@ -7,9 +7,21 @@ ENV_FILE = BASE_DIR / ".env"
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    # Schema is managed by Alembic; only enable for throwaway dev databases
+    AUTO_CREATE_TABLES: bool = False
     SECRET_KEY: str = "your-super-secret-key-change-it"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    JWT_CACHE_ENABLED: bool = True
+    JWT_CACHE_TTL: int = 30
+    USER_CACHE_ENABLED: bool = True
+    # Per process: invalidate_user does not reach other workers, so a change
+    # (e.g. redeeming an access code) can take up to this long to show there
+    USER_CACHE_TTL: int = 30
     
     # OAuth
     GOOGLE_CLIENT_ID: str = "your-google-client-id"
@@ -2,7 +2,8 @@ import httpx
 import logging
 import base64
 from datetime import datetime
-from typing import Any, Dict, Callable
+from functools import lru_cache
+from typing import Any, Dict, Callable, Tuple
 from core.config import settings
 
 logging.basicConfig(level=logging.INFO)
@@ -10,8 +11,9 @@ logger = logging.getLogger(__name__)
 
 # --- Email Templates ---
 
-def _base_template(content: str) -> str:
-    year = datetime.now().year
+_CONTENT_SLOT = "\x00SPLIT\x00"
+
+def _render_shell(year: int) -> str:
     return f"""
     <!DOCTYPE html>
     <html>
@@ -95,7 +97,7 @@ def _base_template(content: str) -> str:
                 <h1>Welcome to huzlr.</h1>
             </div>
             <div class="content">
-                {content}
+                {_CONTENT_SLOT}
             </div>
             <div class="footer">
                 <p>&copy; {year} Huzlr. All rights reserved.</p>
@@ -106,6 +108,16 @@ def _base_template(content: str) -> str:
     </html>
     """
 
+@lru_cache(maxsize=1)
+def _shell(year: int) -> Tuple[str, str]:
+    """Header and footer halves of the email shell, rendered once per year."""
+    header, footer = _render_shell(year).split(_CONTENT_SLOT)
+    return header, footer
+
+def _base_template(content: str) -> str:
+    header, footer = _shell(datetime.now().year)
+    return header + content + footer
+
 def template_access_code(context: Dict[str, Any]) -> str:
     code = context.get("code", "")
     frontend_url = context.get("frontend_url", settings.FRONTEND_BASE_URL)
@@ -150,7 +162,14 @@ TEMPLATES: Dict[str, Callable[[Dict[str, Any]], str]] = {
 
 # --- Async Sender Function ---
 
-async def send_email(to_email: str, subject: str, template_name: str, context: Dict[str, Any] = {}) -> bool:
+async def send_email(
+    to_email: str,
+    subject: str,
+    template_name: str,
+    context: Dict[str, Any] = {},
+    *,
+    client: httpx.AsyncClient,
+) -> bool:
     """
     Sends an email using a specified template via Mailjet Send API (Async).
     
@@ -159,6 +178,7 @@ async def send_email(to_email: str, subject: str, template_name: str, context: D
         subject: Email subject
         template_name: Name of the template to use (must be in TEMPLATES)
         context: Dictionary of data to pass to the template
+        client: Shared HTTP client (app.state.http)
     """
     if not settings.MAILJET_API_KEY or not settings.MAILJET_SECRET_KEY:
         logger.warning("Mailjet credentials not found. Skipping email send.")
@@ -196,13 +216,12 @@ async def send_email(to_email: str, subject: str, template_name: str, context: D
           ]
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.mailjet.com/v3.1/send",
-                json=data,
-                auth=(settings.MAILJET_API_KEY, settings.MAILJET_SECRET_KEY),
-                timeout=10.0
-            )
+        response = await client.post(
+            "https://api.mailjet.com/v3.1/send",
+            json=data,
+            auth=(settings.MAILJET_API_KEY, settings.MAILJET_SECRET_KEY),
+            timeout=10.0
+        )
 
         logger.info(f"Mailjet Response: {response.status_code} - {response.text}")
         
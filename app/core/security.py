@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
-from typing import Any, Union
-from jose import jwt
+from typing import Any, Dict, Union
+import httpx
+import jwt
 from passlib.context import CryptContext
 from core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
+# Resolve the bcrypt backend at import so the first signup/login doesn't pay for it
+pwd_context.hash("warmup")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,3 +26,29 @@ def create_access_token(subject: Union[str, Any], expires_delta: timedelta = Non
         to_encode.update(claims)
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+GOOGLE_CERTS_URI = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ID_TOKEN_LEEWAY = 60  # seconds
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+
+async def fetch_google_jwks(client: httpx.AsyncClient) -> Dict[str, jwt.PyJWK]:
+    """Fetch Google's signing keys, parsed once and keyed by "kid"."""
+    response = await client.get(GOOGLE_CERTS_URI)
+    response.raise_for_status()
+    return {key["kid"]: jwt.PyJWK(key) for key in response.json()["keys"]}
+
+def verify_google_id_token(id_token: str, jwks: Dict[str, jwt.PyJWK]) -> dict:
+    """Verify a Google id_token against cached JWKS and return its claims.
+
+    Raises KeyError if the signing key is not in ``jwks`` and jwt.PyJWTError if verification fails.
+    """
+    kid = jwt.get_unverified_header(id_token).get("kid")
+    return jwt.decode(
+        id_token,
+        jwks[kid].key,
+        algorithms=["RS256"],
+        audience=settings.GOOGLE_CLIENT_ID,
+        issuer=GOOGLE_ISSUERS,
+        # Tolerate clock skew with Google; PyJWT rejects an "iat" later than now + leeway
+        leeway=GOOGLE_ID_TOKEN_LEEWAY,
+    )
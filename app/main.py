@@ -2,18 +2,20 @@ import sys
 import os
 import asyncio
 import logging
+import httpx
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 # Trigger reload
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
 
 # Add current directory to sys.path to resolve imports when running from root
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from api.v1.router import api_router
-from core.database import engine, AsyncSessionLocal
+from core.database import engine
 from core.config import settings
+from core.security import fetch_google_jwks
 
 # Import all models to ensure they are registered with SQLAlchemy
 from models.base import Base
@@ -34,35 +36,43 @@ from models.project import Project
 
 logger = logging.getLogger(__name__)
 
-async def periodic_health_check():
+
+async def periodic_google_jwks_refresh(app: FastAPI):
     while True:
         try:
-            async with AsyncSessionLocal() as session:
-                await session.execute(text("SELECT 1"))
-            logger.info("Health check passed: Database connected")
+            app.state.google_jwks = await fetch_google_jwks(app.state.http)
+            logger.info("Refreshed Google JWKS")
         except Exception as e:
-            logger.error(f"Health check failed: {e}")
-        await asyncio.sleep(60)
+            logger.error(f"Google JWKS refresh failed: {e}")
+        await asyncio.sleep(3600)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Start background health check
-    health_check_task = asyncio.create_task(periodic_health_check())
+    # Shared outbound HTTP client (Google OAuth, Mailjet) so connections are reused
+    app.state.http = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60),
+    )
+    app.state.google_jwks = {}
+    jwks_refresh_task = asyncio.create_task(periodic_google_jwks_refresh(app))
     
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if settings.AUTO_CREATE_TABLES:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
     yield
     
     # Cancel background task on shutdown
-    health_check_task.cancel()
+    jwks_refresh_task.cancel()
     try:
-        await health_check_task
+        await jwks_refresh_task
     except asyncio.CancelledError:
         pass
 
+    await app.state.http.aclose()
+
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS Configuration
 origins = [
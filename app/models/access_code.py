@@ -1,9 +1,13 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean, ForeignKey, Integer, BigInteger
+from sqlalchemy import String, Boolean, ForeignKey, Integer, BigInteger, Index, text
 from models.base import Base
 
 class AccessCode(Base):
     __tablename__ = "access_codes"
+    __table_args__ = (
+        # Only redeemable codes are looked up on verify
+        Index("ix_unused_access_codes_code", "code", postgresql_where=text("is_used = false")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     code: Mapped[str] = mapped_column(String(50), unique=True, index=True)
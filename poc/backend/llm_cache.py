@@ -0,0 +1,71 @@
+"""Exact-match response cache for LLM calls.
+
+Values are looked up in a small in-process LRU first, then in Redis when
+REDIS_URL is set and the `redis` package is installed.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis is optional; fall back to the in-process tier only
+    redis = None
+
+log = logging.getLogger("standmate.llm_cache")
+
+DEFAULT_TTL = 24 * 60 * 60
+LOCAL_MAXSIZE = 256
+
+_local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+_redis_url = os.getenv("REDIS_URL")
+_redis = redis.from_url(_redis_url, decode_responses=True) if redis and _redis_url else None
+
+
+def make_key(**parts: Any) -> str:
+    """Stable SHA-256 key over the inputs that determine an LLM response."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return "llm:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, value: str, ttl: int) -> None:
+    _local[key] = (time.monotonic() + ttl, value)
+    _local.move_to_end(key)
+    while len(_local) > LOCAL_MAXSIZE:
+        _local.popitem(last=False)
+
+
+async def get(key: str) -> Optional[str]:
+    entry = _local.get(key)
+    if entry is not None:
+        expires_at, value = entry
+        if expires_at > time.monotonic():
+            _local.move_to_end(key)
+            return value
+        del _local[key]
+
+    if _redis is None:
+        return None
+    try:
+        value = await _redis.get(key)
+    except redis.RedisError as e:
+        log.warning("LLM cache read failed: %s", e)
+        return None
+    if value is not None:
+        _remember(key, value, DEFAULT_TTL)
+    return value
+
+
+async def set(key: str, value: str, ttl: int = DEFAULT_TTL) -> None:
+    _remember(key, value, ttl)
+    if _redis is None:
+        return
+    try:
+        await _redis.set(key, value, ex=ttl)
+    except redis.RedisError as e:
+        log.warning("LLM cache write failed: %s", e)
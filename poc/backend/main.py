@@ -1,24 +1,48 @@
 import asyncio
-import json
+import atexit
+import logging
+import queue
+import orjson
 import uuid
 import time
 import os
-from typing import List, TypedDict, Generator, Dict, Any, Optional
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from operator import add
+from typing import TYPE_CHECKING, Annotated, List, TypedDict, AsyncGenerator, Dict, Any, Tuple
 
 from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
+from starlette.types import Send
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Log records are queued here and written to stderr by a background thread,
+# so logging never blocks the event loop on a stream write
+log = logging.getLogger("standmate")
+log.setLevel(logging.INFO)
+log.propagate = False
+_log_queue: queue.Queue = queue.Queue(-1)
+log.addHandler(QueueHandler(_log_queue))
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+import llm_cache
+import semantic_cache
+
 # --- 1. Pydantic Models for Data and API ---
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+from pydantic_core import to_json
 
 class Task(BaseModel):
     """The strict structure for a single task card streamed to the frontend."""
-    id: str = Field(description="A unique UUID for the task.")
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), description="A unique UUID for the task.")
     title: str = Field(description="A concise, actionable title for the task.")
     description: str = Field(description="A detailed explanation of the task, its goal, and expected outcomes.")
     tags: List[str] = Field(description="A list of relevant category tags (e.g., 'Backend', 'UI', 'DevOps').")
@@ -27,120 +51,113 @@ class ProjectInput(BaseModel):
     """The input structure for the API endpoint."""
     prompt: str = Field(description="The high-level project idea provided by the user.")
 
-class TaskGeneration(BaseModel):
-    """Output schema for the LLM to generate the next task or signal completion."""
-    task: Optional[Task] = Field(default=None, description="The next task to be added to the plan.")
-    is_finished: bool = Field(default=False, description="Set to True if the plan is complete and no more tasks are needed.")
+class TaskPlan(BaseModel):
+    """Output schema for the LLM to generate the whole plan in one call."""
+    tasks: List[Task] = Field(description="The ordered list of tasks that make up the plan.")
 
 
 # --- 2. LangGraph Agent Setup ---
-from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage
+# LangGraph and LangChain are heavy imports; they are loaded on the first
+# request (see _get_planner / _get_app) so the server starts quickly.
+if TYPE_CHECKING:
+    from langgraph.types import StreamWriter
 
 # Define State
 class AgentState(TypedDict):
     """The state passed between nodes in the LangGraph."""
     prompt: str
-    tasks: List[Task]
+    # Nodes return only new tasks; the reducer appends them to the state
+    tasks: Annotated[List[Task], add]
     finished: bool
 
-# Initialize LLM
-# Ensure GOOGLE_API_KEY is set in your environment or .env file
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+# temperature=0 keeps responses deterministic so they are safe to cache
+LLM_MODEL = "gemini-2.5-flash"
+MAX_TASKS = 10
+LLM_TIMEOUT = 30
 
-# Define the Node
-def generate_task_node(state: AgentState) -> Dict[str, Any]:
-    """
-    Generates the next task in the plan based on the user's prompt and existing tasks.
-    """
-    prompt = state["prompt"]
-    current_tasks = state["tasks"]
-    
-    # Construct context from existing tasks
-    task_history = "\n".join([f"- {t.title}: {t.description}" for t in current_tasks])
-    
-    system_prompt = """You are an expert project planner and technical architect.
+SYSTEM_PROMPT = f"""You are an expert project planner and technical architect.
     Your goal is to break down a high-level project idea into a series of actionable, technical tasks.
     
-    You must generate tasks ONE BY ONE in a logical implementation order.
-    
-    For each step:
-    1. Review the Project Idea.
-    2. Review the Tasks already generated.
-    3. Determine the NEXT logical task required.
-    4. If the plan is complete and covers all aspects (Backend, Frontend, DevOps, Testing), set 'is_finished' to True.
+    Generate the complete plan at once, as at most {MAX_TASKS} tasks in a logical implementation order.
+    The plan must cover all aspects (Backend, Frontend, DevOps, Testing).
     
     Be specific, technical, and practical.
     """
-    
-    user_message = f"""Project Idea: {prompt}
 
-    Already Generated Tasks:
-    {task_history if task_history else "No tasks generated yet."}
+@lru_cache(maxsize=1)
+def _get_planner():
+    """Returns the streaming plan chain (LLM | TaskPlan JSON parser) and its constant system message."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_core.messages import SystemMessage
+    from langchain_core.output_parsers import JsonOutputParser
+
+    # Ensure GOOGLE_API_KEY is set in your environment or .env file
+    # One call now produces the whole plan, so allow it more than a per-task budget
+    llm = ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0, timeout=LLM_TIMEOUT, max_retries=1)
+    plan_parser = JsonOutputParser(pydantic_object=TaskPlan)
+    system_message = SystemMessage(content=f"{SYSTEM_PROMPT}\n{plan_parser.get_format_instructions()}")
+    # Parse the JSON as it streams so partial tasks can be forwarded
+    return llm | plan_parser, system_message
 
-    Generate the next task or finish the plan.
+# Define the Node
+async def generate_task_node(state: AgentState, writer: "StreamWriter") -> Dict[str, Any]:
     """
+    Generates the complete plan for the user's prompt in a single LLM call.
+    """
+    prompt = state["prompt"]
+    plan_chain, system_message = _get_planner()
     
-    # Bind the structured output schema
-    structured_llm = llm.with_structured_output(TaskGeneration)
-    
-    # Call LLM
+    user_message = f"""Project Idea: {prompt}
+
+    Generate the task plan.
+    """
+
+    # Call LLM (or replay an identical earlier call)
     try:
-        result = structured_llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_message)
-        ])
-        
-        if result.is_finished:
-            return {"finished": True}
-        
-        if result.task:
-            # Ensure ID is present
-            if not result.task.id:
-                result.task.id = str(uuid.uuid4())
-            
-            return {
-                "tasks": current_tasks + [result.task],
-                "finished": False
-            }
+        cache_key = llm_cache.make_key(
+            model=LLM_MODEL, sys=system_message.content, user=user_message, schema="TaskPlan/v1"
+        )
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            result = TaskPlan.model_validate_json(cached)
         else:
-             return {"finished": True}
+            # Async streaming call: the event loop keeps serving other connections while Gemini responds
+            plan = {}
+            async for plan in plan_chain.astream([system_message, ("human", user_message)]):
+                # Same cap as the final state, so the client never shows tasks that get dropped
+                writer((plan.get("tasks") or [])[:MAX_TASKS])
+            result = TaskPlan.model_validate(plan)
+            await llm_cache.set(cache_key, result.model_dump_json())
+        
+        return {"tasks": result.tasks[:MAX_TASKS], "finished": True}
              
     except Exception as e:
-        print(f"LLM Error: {e}")
+        log.exception("LLM Error: %s", e)
         return {"finished": True}
 
 
 # Define the Graph
-workflow = StateGraph(AgentState)
-
-workflow.add_node("planner", generate_task_node)
-workflow.set_entry_point("planner")
-
-def should_continue(state: AgentState) -> str:
-    if state.get("finished", False):
-        return END
-    if len(state["tasks"]) >= 10:
-        return END
-    return "planner"
-
-workflow.add_conditional_edges(
-    "planner",
-    should_continue,
-    {
-        "planner": "planner",
-        END: END
-    }
-)
+@lru_cache(maxsize=1)
+def _get_app():
+    """Builds and compiles the planner graph on first use."""
+    from langgraph.graph import StateGraph, END
+
+    workflow = StateGraph(AgentState)
+
+    workflow.add_node("planner", generate_task_node)
+    workflow.set_entry_point("planner")
+    workflow.add_edge("planner", END)
 
-langgraph_app = workflow.compile()
+    return workflow.compile()
 
 
 # --- 3. FastAPI Implementation ---
 
-app = FastAPI(title="Streaming Task Agent Backend")
+app = FastAPI(title="Streaming Task Agent Backend", default_response_class=ORJSONResponse)
 
+# Starlette's CORSMiddleware is already a pure ASGI middleware (it wraps `send`
+# and never buffers the body), so SSE frames pass straight through. Keep any
+# middleware added here pure ASGI too; BaseHTTPMiddleware would buffer streams.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -150,67 +167,174 @@ app.add_middleware(
 )
 
 
-async def task_stream_generator(project_prompt: str) -> Generator[bytes, None, None]:
+_SSE_PRE = b"data: "
+_SSE_POST = b"\n\n"
+
+
+def sse_frame(data: Dict[str, Any]) -> bytes:
+    return _SSE_PRE + orjson.dumps(data) + _SSE_POST
+
+
+_DESC_SLOT = "\x00DESC\x00"
+_DESC_SLOT_JSON = orjson.dumps(_DESC_SLOT)
+
+
+def task_frame_template(frame: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """SSE frame bytes before and after the JSON-encoded description of a task."""
+    prefix, suffix = sse_frame({**frame, "description": _DESC_SLOT}).split(_DESC_SLOT_JSON)
+    return prefix, suffix
+
+
+STREAM_QUEUE_SIZE = 4
+STREAM_TIMEOUT = 60
+EMBED_TIMEOUT = 5
+_NO_ITEM = object()
+
+
+async def _drive_graph(initial_state: AgentState, events: asyncio.Queue) -> None:
+    """Feeds graph stream events into ``events``; ends with None, or the error that stopped it."""
+    try:
+        async for item in _get_app().astream(initial_state, stream_mode=["custom", "values"]):
+            await events.put(item)
+    except Exception as e:
+        await events.put(e)
+        return
+    await events.put(None)
+
+
+async def task_stream_generator(project_prompt: str) -> AsyncGenerator[bytes, None]:
     """
     Asynchronous generator that drives LangGraph execution and yields
-    complete, serialized task objects as NDJSON.
+    task objects as SSE frames while the model writes them.
     """
     initial_state = AgentState(prompt=project_prompt, tasks=[], finished=False)
     
-    print(f"Starting generation for prompt: {project_prompt}")
+    log.info("Starting generation for prompt: %s", project_prompt)
+
+    # Replay the plan of a sufficiently similar earlier prompt, if any
+    prompt_vector = None
+    try:
+        prompt_vector = await asyncio.wait_for(semantic_cache.embed(project_prompt), EMBED_TIMEOUT)
+        cached_tasks = semantic_cache.lookup(prompt_vector, project_prompt)
+    except Exception as e:
+        log.warning("Semantic cache unavailable: %s", e)
+        cached_tasks = None
+
+    if cached_tasks is not None:
+        for task_data in cached_tasks:
+            yield sse_frame({**task_data, "id": str(uuid.uuid4())})
+        yield sse_frame({'status': 'completed'})
+        return
     
-    num_tasks_sent = 0
+    # Last frame sent per task index; ids are assigned here so they stay
+    # stable while the model is still writing the task
+    sent_frames: List[Dict[str, Any]] = []
+    # Per task index, the frame bytes around its description; reused while only the description grows
+    templates: Dict[int, Tuple[bytes, bytes]] = {}
+    current_tasks = []
+
+    # The graph runs as a separate task so the model keeps streaming while frames are written out
+    events: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    producer = asyncio.create_task(_drive_graph(initial_state, events))
+    # Per-connection deadline so a hung upstream call cannot hold the stream open forever
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_TIMEOUT
 
     try:
-        # Stream the graph execution
-        async for state_change in langgraph_app.astream(initial_state, stream_mode="values"):
+        # "custom" carries partial tasks, "values" the final state
+        next_item = _NO_ITEM
+        while True:
+            if next_item is _NO_ITEM:
+                item = await asyncio.wait_for(events.get(), deadline - loop.time())
+            else:
+                item = next_item
+            next_item = _NO_ITEM
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            mode, chunk = item
+            
+            if mode == "custom":
+                # Partial task lists are cumulative, so ones already queued behind this
+                # one supersede it; send a single frame for the newest state
+                while not events.empty():
+                    next_item = events.get_nowait()
+                    if not (isinstance(next_item, tuple) and next_item[0] == "custom"):
+                        break
+                    chunk = next_item[1]
+                    next_item = _NO_ITEM
+
+                for i, partial_task in enumerate(chunk):
+                    if i == len(sent_frames):
+                        sent_frames.append({"id": str(uuid.uuid4()), "title": "", "description": "", "tags": []})
+                    # Update the task's frame in place; only changed fields are copied over
+                    frame = sent_frames[i]
+                    changed = [
+                        key for key in ("title", "description", "tags")
+                        if key in partial_task and partial_task[key] != frame[key]
+                    ]
+                    if not changed:
+                        continue
+                    for key in changed:
+                        frame[key] = partial_task[key]
+                    if changed != ["description"] or i not in templates:
+                        templates[i] = task_frame_template(frame)
+                    prefix, suffix = templates[i]
+                    yield prefix + orjson.dumps(frame["description"]) + suffix
+                continue
             
-            current_tasks = state_change.get('tasks', [])
+            current_tasks = chunk.get('tasks', [])
             
-            if len(current_tasks) > num_tasks_sent:
-                for i in range(num_tasks_sent, len(current_tasks)):
-                    new_task = current_tasks[i]
-                    
-                    # --- UI SIMULATION START ---
-                    # 1. Yield Structure (Empty)
-                    initial_task_data = new_task.dict()
-                    initial_task_data['description'] = ""
-                    yield f"data: {json.dumps(initial_task_data, default=str)}\n\n".encode("utf-8")
-                    
-                    # 2. Simulate Typing
-                    full_description = new_task.description
-                    chunk_size = 4
-                    for j in range(0, len(full_description), chunk_size):
-                        current_desc = full_description[:j+chunk_size]
-                        
-                        partial_task_data = initial_task_data.copy()
-                        partial_task_data['description'] = current_desc
-                        yield f"data: {json.dumps(partial_task_data, default=str)}\n\n".encode("utf-8")
-                        await asyncio.sleep(0.01)
-                    
-                    # 3. Yield Final
-                    yield f"data: {json.dumps(new_task.dict(), default=str)}\n\n".encode("utf-8")
-                    # --- UI SIMULATION END ---
-                
-                num_tasks_sent = len(current_tasks)
+            # Tasks that did not stream (exact-match cache hit) are sent whole
+            for new_task in current_tasks[len(sent_frames):]:
+                yield _SSE_PRE + to_json(new_task) + _SSE_POST
             
-            if state_change.get('finished'):
-                yield f"data: {json.dumps({'status': 'completed'})}\n\n".encode("utf-8")
+            if chunk.get('finished'):
                 break
+
+        if prompt_vector is not None and current_tasks:
+            semantic_cache.store(prompt_vector, project_prompt, [t.model_dump() for t in current_tasks])
+        yield sse_frame({'status': 'completed'})
             
+    except asyncio.TimeoutError:
+        log.warning("Generation timed out after %ss for prompt: %s", STREAM_TIMEOUT, project_prompt)
+        yield sse_frame({'status': 'error', 'detail': 'timeout'})
     except Exception as e:
-        print(f"STREAMING ERROR: {e}")
-        yield f"data: {json.dumps({'status': 'error', 'detail': str(e)})}\n\n".encode("utf-8")
+        log.exception("STREAMING ERROR: %s", e)
+        yield sse_frame({'status': 'error', 'detail': str(e)})
+    finally:
+        producer.cancel()
         
 
+class SSEResponse(StreamingResponse):
+    """StreamingResponse that sends the headers and the first frame back to back."""
+    media_type = "text/event-stream"
+
+    async def stream_response(self, send: Send) -> None:
+        body = self.body_iterator.__aiter__()
+        first_chunk = await anext(body, b"")
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": first_chunk, "more_body": True})
+        async for chunk in body:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
 @app.get("/api/stream_tasks")
 async def stream_tasks(prompt: str):
-    return StreamingResponse(
-        task_stream_generator(prompt),
-        media_type="text/event-stream"
-    )
+    return SSEResponse(task_stream_generator(prompt))
 
 if __name__ == "__main__":
     import uvicorn
-    print("FastAPI server starting on http://127.0.0.1:8000")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    log.info("FastAPI server starting on http://127.0.0.1:8000")
+    # Workers need an import string; each one builds its own LLM client and in-process caches
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=max(2, os.cpu_count() or 1),
+        log_level="warning",
+    )
@@ -0,0 +1,109 @@
+"""Semantic cache for whole task plans.
+
+Project prompts are embedded and compared by cosine similarity with earlier
+prompts. A close enough match replays that plan instead of running the
+planner, after swapping in the words that differ between the two prompts
+(e.g. "a SaaS for dentists" -> "a SaaS for vets").
+"""
+import difflib
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+log = logging.getLogger("standmate.semantic_cache")
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 60 * 60)))
+MAXSIZE = 1000
+
+
+@lru_cache(maxsize=1)
+def _get_embeddings():
+    # Imported on first use to keep server startup fast
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+
+
+@dataclass
+class _Entry:
+    prompt: str
+    tasks: List[Dict[str, Any]]
+    expires_at: float
+
+
+# Row i of _vectors is the unit-length embedding of _entries[i]
+_entries: List[_Entry] = []
+_vectors = np.empty((0, 0), dtype=np.float32)
+
+stats = {"hits": 0, "misses": 0}
+
+
+def _normalize(prompt: str) -> str:
+    return " ".join(prompt.lower().split())
+
+
+async def embed(prompt: str) -> np.ndarray:
+    vector = np.asarray(await _get_embeddings().aembed_query(_normalize(prompt)), dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _evict(now: float) -> None:
+    global _entries, _vectors
+    keep = [i for i, entry in enumerate(_entries) if entry.expires_at > now][-MAXSIZE:]
+    if len(keep) != len(_entries):
+        _entries = [_entries[i] for i in keep]
+        _vectors = _vectors[keep]
+
+
+def lookup(vector: np.ndarray, prompt: str) -> Optional[List[Dict[str, Any]]]:
+    """Returns the adapted task list of the nearest cached prompt, or None."""
+    _evict(time.time())
+    if _entries:
+        scores = _vectors @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= SIMILARITY_THRESHOLD:
+            stats["hits"] += 1
+            log.info("Semantic cache hit (score=%.3f, stats=%s)", scores[best], stats)
+            entry = _entries[best]
+            return _adapt(entry.tasks, _slot_map(entry.prompt, prompt))
+    stats["misses"] += 1
+    return None
+
+
+def store(vector: np.ndarray, prompt: str, tasks: List[Dict[str, Any]]) -> None:
+    global _entries, _vectors
+    now = time.time()
+    _entries.append(_Entry(prompt=prompt, tasks=tasks, expires_at=now + TTL))
+    _vectors = vector[None, :] if _vectors.size == 0 else np.vstack([_vectors, vector])
+    _evict(now)
+
+
+def _slot_map(cached_prompt: str, prompt: str) -> List[Tuple[str, str]]:
+    """Word spans of the cached prompt that were replaced in the new one."""
+    old_words, new_words = cached_prompt.split(), prompt.split()
+    matcher = difflib.SequenceMatcher(a=old_words, b=new_words, autojunk=False)
+    return [
+        (" ".join(old_words[i1:i2]), " ".join(new_words[j1:j2]))
+        for op, i1, i2, j1, j2 in matcher.get_opcodes()
+        if op == "replace"
+    ]
+
+
+def _adapt(tasks: List[Dict[str, Any]], slots: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    if not slots:
+        return [dict(task) for task in tasks]
+    pattern = re.compile("|".join(rf"\b{re.escape(old)}\b" for old, _ in slots), re.IGNORECASE)
+    replacements = {old.lower(): new for old, new in slots}
+
+    def fill(text: str) -> str:
+        return pattern.sub(lambda m: replacements[m.group(0).lower()], text)
+
+    return [{**task, "title": fill(task["title"]), "description": fill(task["description"])} for task in tasks]